@@ -44,16 +44,25 @@ delete_ipython_session(session_id)
 - 实时内存监控和变量管理
 """
 
+import codecs
+import gc
+import io
 import os
 import sys
+import textwrap
 import threading
 import time
+import types
 import uuid
 import traceback
 import re
+from collections import Counter, deque
+from contextlib import redirect_stderr, redirect_stdout
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 # System monitoring
 try:
@@ -65,7 +74,6 @@ except ImportError:
 # IPython imports
 try:
     from IPython.core.interactiveshell import InteractiveShell
-    from IPython.utils.capture import capture_output
     IPYTHON_AVAILABLE = True
 except ImportError:
     IPYTHON_AVAILABLE = False
@@ -93,21 +101,120 @@ try:
 except ImportError:
     EXCEL_XLS_AVAILABLE = False
 
-EXCEL_AVAILABLE = EXCEL_XLSX_AVAILABLE or EXCEL_XLS_AVAILABLE
+# Rust-backed Excel engine (pandas >= 2.2), handles both .xlsx and .xls
+try:
+    import python_calamine
+    EXCEL_CALAMINE_AVAILABLE = True
+except ImportError:
+    EXCEL_CALAMINE_AVAILABLE = False
+
+EXCEL_AVAILABLE = EXCEL_XLSX_AVAILABLE or EXCEL_XLS_AVAILABLE or EXCEL_CALAMINE_AVAILABLE
+
+# Arrow CSV reader (multithreaded parsing)
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# get_variables 中的类型分派表
+_SKIP_TYPES = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)
+_DATAFRAME_TYPES = (pd.DataFrame,) if PANDAS_AVAILABLE else ()
+_ARRAY_TYPES = (np.ndarray, pd.Series) if PANDAS_AVAILABLE else ()
+
+# 预览/采样共用的随机数生成器 (PCG64)，避免每次调用重新创建或使用旧版全局 RandomState
+_RNG = np.random.default_rng() if PANDAS_AVAILABLE else None
 
 # MCP imports
 from fastmcp import FastMCP
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 # 创建MCP应用实例
 mcp = FastMCP("IPython Data Analysis MCP Server")
 
-# 全局会话管理器
-_session_manager = None
-_session_lock = threading.Lock()
+# 字节 -> MB 换算系数
+_MB = 1.0 / (1024 * 1024)
+
+# 编码检测时读取的文件前缀字节数
+_ENCODING_SNIFF_BYTES = 64 * 1024
+
+# pd.read_csv 默认识别为空值的字符串，Arrow CSV 读取器使用同一套规则
+_CSV_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+# 自动导入代码，模块加载时编译一次
+_AUTO_IMPORT_CODE = compile(textwrap.dedent("""
+    import pandas as pd
+    import numpy as np
+    import json
+    import os
+    import sys
+    from pathlib import Path
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    # 设置pandas显示选项
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', None)
+    pd.set_option('display.max_colwidth', 100)
+
+    print("✓ 已自动导入: pandas, numpy, json, os, sys, pathlib")
+    """), '<auto_import>', 'exec')
+
+# 自动导入的命名空间模板，首个会话完成导入后填充，后续会话直接复制
+_AUTO_IMPORT_NAMES = ('pd', 'np', 'json', 'os', 'sys', 'Path', 'warnings')
+_auto_import_template: Dict[str, Any] = {}
+
+def _env_positive_int(name: str, default: int) -> int:
+    """读取正整数环境变量，未设置或取值无效时使用默认值"""
+    try:
+        value = int(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+# 每个会话保留的执行历史条数，可通过环境变量调整
+_HISTORY_MAXLEN = _env_positive_int('DATAHILL_HISTORY_MAX', 100)
+_HISTORY_OUTPUT_KEYS = frozenset({'stdout', 'stderr', 'result'})
+
+# 表达式结果超过该单元格数的 DataFrame 只格式化前若干行
+_RESULT_MAX_CELLS = 10_000
+_RESULT_PREVIEW_ROWS = 50
+
+# 变量内容预览的最大元素数和最大字符数
+_PREVIEW_MAX_ELEMS = 10
+_PREVIEW_MAX_CHARS = 200
+
+# get_variable_info 中列出列名和 dtype 的最大列数
+_INFO_MAX_COLUMNS = 200
+
+# 清理变量时释放的数据量超过该值才执行完整的垃圾回收
+_GC_MIN_FREED_BYTES = 10 * 1024 * 1024
+
+# 不视为用户变量的内置名称
+_HIDDEN_NAMES = frozenset({'In', 'Out', 'get_ipython', 'exit', 'quit', 'open'})
+
+# 变量类型名 -> 统计分组，未命中时由 _type_bucket 按名称模式判断
+_TYPE_BUCKET = {
+    'list': 'lists',
+    'tuple': 'lists',
+    'set': 'lists',
+    'int': 'scalars',
+    'float': 'scalars',
+    'str': 'scalars',
+    'bool': 'scalars'
+}
+
+# ANSI 转义序列的正则表达式（模块级预编译，避免每次调用重复编译）
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
 class ExecutionResult(BaseModel):
     """代码执行结果模型"""
+    model_config = ConfigDict(validate_assignment=False, extra='forbid')
+    
     success: bool
     execution_count: int
     stdout: str
@@ -129,21 +236,81 @@ class SessionInfo(BaseModel):
 
 def remove_ansi_codes(text: str) -> str:
     """移除文本中的 ANSI 转义序列"""
-    if not text:
+    # 无颜色模式下通常不含 ESC 字符，直接跳过正则匹配
+    if not text or '\x1b' not in text:
         return text
-    # ANSI 转义序列的正则表达式
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text)
+    return _ANSI_RE.sub('', text)
+
+@lru_cache(maxsize=256)
+def _type_bucket(var_type: str) -> str:
+    """将变量类型名映射到统计分组 (dataframes/lists/scalars/functions/others)"""
+    bucket = _TYPE_BUCKET.get(var_type)
+    if bucket is not None:
+        return bucket
+    if 'DataFrame' in var_type:
+        return 'dataframes'
+    if 'function' in var_type.lower():
+        return 'functions'
+    return 'others'
+
+def _bounded_repr(obj: Any, max_elems: int = _PREVIEW_MAX_ELEMS,
+                  max_chars: int = _PREVIEW_MAX_CHARS) -> str:
+    """生成截断后的预览文本，容器先截取前若干元素再格式化，避免格式化整个大容器"""
+    truncated = False
+    # 只对内置容器本身截取元素，namedtuple、Counter 等子类保留自身的 repr
+    obj_type = type(obj)
+    if obj_type in (list, tuple):
+        truncated = len(obj) > max_elems
+        text = str(obj[:max_elems])
+    elif obj_type is dict:
+        truncated = len(obj) > max_elems
+        text = str(dict(islice(obj.items(), max_elems)))
+    elif obj_type in (set, frozenset):
+        truncated = len(obj) > max_elems
+        text = str(obj_type(islice(obj, max_elems)))
+    else:
+        text = str(obj)
+    
+    if len(text) > max_chars:
+        text = text[:max_chars]
+        truncated = True
+    return text + "..." if truncated else text
 
 class IPythonSession:
     """IPython 会话封装"""
     
-    def __init__(self, session_id: str, auto_import: bool = True):
+    def __init__(self, session_id: str, auto_import: bool = True, debug: bool = False):
         self.session_id = session_id
+        self.debug = debug
         self.created_at = datetime.now()
         self.last_used = datetime.now()
         self.execution_count = 0
-        self.history = []
+        # 限长队列，超出上限时自动丢弃最早的记录
+        self.history = deque(maxlen=_HISTORY_MAXLEN)
+        # 不含输出内容的历史视图，写入时生成，查询时无需逐条过滤
+        self.history_brief = deque(maxlen=_HISTORY_MAXLEN)
+        
+        # 缓存当前进程句柄，避免每次执行都重新构造 psutil.Process
+        self._proc = psutil.Process() if PSUTIL_AVAILABLE else None
+        
+        # DataFrame 深度内存统计缓存: id(df) -> (shape, bytes)
+        self._mem_cache: Dict[int, tuple] = {}
+        
+        # 命名空间版本号，每次清空缓存时递增；并发的工具调用只在版本未变时写入缓存
+        self._ns_version = 0
+        # 变量名 -> DataFrame 查找缓存，命名空间发生变化时清空
+        self._df_cache: Dict[str, Any] = {}
+        # 命名空间中全部 DataFrame 的登记表，None 表示需要重建
+        self._dataframes: Optional[Dict[str, Any]] = None
+        # DataFrame 信息/统计摘要的结果缓存，命名空间发生变化时清空
+        self._meta_cache: Dict[tuple, tuple] = {}
+        
+        # 捕获 stdout/stderr 的缓冲区，每次执行前清空后复用
+        self._stdout_buf = io.StringIO()
+        self._stderr_buf = io.StringIO()
+        
+        # 自动生成变量名时每个文件名已使用的序号
+        self._name_counters: Counter = Counter()
         
         if not IPYTHON_AVAILABLE:
             raise ImportError("IPython is required but not available")
@@ -154,10 +321,16 @@ class IPythonSession:
         # 配置无颜色模式以避免 ANSI 代码
         self.shell.colors = 'NoColor'
         
-        # 配置 PlainTextFormatter 减少详细输出
+        # 配置 PlainTextFormatter 减少详细输出，并缓存格式化器供每次执行复用
+        self._display_formatter = self.shell.display_formatter
+        self._plain_formatter = None
         try:
-            plain_formatter = self.shell.display_formatter.formatters['text/plain']
+            plain_formatter = self._display_formatter.formatters['text/plain']
             plain_formatter.verbose = False
+            # Out[n] 回显和返回的 result 都经过该格式化器，大 DataFrame 在此统一截断
+            if PANDAS_AVAILABLE:
+                plain_formatter.for_type(pd.DataFrame, self._pretty_dataframe)
+            self._plain_formatter = plain_formatter
         except:
             pass
         
@@ -176,33 +349,45 @@ class IPythonSession:
     def _auto_import_libraries(self) -> List[str]:
         """自动导入常用库"""
         imported = []
-        import_code = """
-            import pandas as pd
-            import numpy as np
-            import json
-            import os
-            import sys
-            from pathlib import Path
-            import warnings
-            warnings.filterwarnings('ignore')
-
-            # 设置pandas显示选项
-            pd.set_option('display.max_columns', None)
-            pd.set_option('display.width', None)
-            pd.set_option('display.max_colwidth', 100)
-
-            print("✓ 已自动导入: pandas, numpy, json, os, sys, pathlib")
-            """
+        
+        if _auto_import_template:
+            # 模块已在进程内导入、显示选项已全局生效，直接复用模板中的对象引用
+            self.shell.user_ns.update(_auto_import_template)
+            return ["pandas", "numpy", "json", "os", "sys", "pathlib"]
         
         try:
-            result = self.shell.run_cell(import_code)
-            if not result.error_in_exec:
-                imported = ["pandas", "numpy", "json", "os", "sys", "pathlib"]
+            # 直接执行预编译的导入代码，跳过 run_cell 的输入转换和历史记录
+            exec(_AUTO_IMPORT_CODE, self.shell.user_ns)
+            imported = ["pandas", "numpy", "json", "os", "sys", "pathlib"]
+            _auto_import_template.update(
+                {name: self.shell.user_ns[name] for name in _AUTO_IMPORT_NAMES}
+            )
         except Exception as e:
             print(f"自动导入失败: {e}")
         
         return imported
     
+    def _format_large_dataframe(self, result_obj: Any) -> Optional[str]:
+        """display.max_rows 不限制行数时，大 DataFrame 只格式化前若干行，避免生成超大字符串
+        
+        max_rows 有限制时 pandas 自身的 repr 已经截断 (通常只显示 10 行)，返回 None 交由格式化器处理；
+        其他对象同样返回 None
+        """
+        if not isinstance(result_obj, _DATAFRAME_TYPES):
+            return None
+        if pd.get_option('display.max_rows'):
+            return None
+        n_rows, n_cols = result_obj.shape
+        if n_rows * n_cols <= _RESULT_MAX_CELLS or n_rows <= _RESULT_PREVIEW_ROWS:
+            return None
+        return (result_obj.head(_RESULT_PREVIEW_ROWS).to_string(max_cols=pd.get_option('display.max_columns'))
+                + f"\n...\n[{n_rows} rows x {n_cols} columns, showing first {_RESULT_PREVIEW_ROWS} rows]")
+    
+    def _pretty_dataframe(self, obj: Any, p: Any, cycle: bool) -> None:
+        """PlainTextFormatter 的 DataFrame 打印函数，行数不受限制时只输出前若干行"""
+        truncated = self._format_large_dataframe(obj)
+        p.text(truncated if truncated is not None else repr(obj))
+    
     def _format_result(self, result_obj: Any) -> str:
         """使用 IPython DisplayFormatter 格式化结果对象"""
         if result_obj is None:
@@ -210,7 +395,7 @@ class IPythonSession:
         
         try:
             # 优先使用 IPython 的 DisplayFormatter 系统
-            format_dict, _ = self.shell.display_formatter.format(
+            format_dict, _ = self._display_formatter.format(
                 result_obj, 
                 include=['text/plain']
             )
@@ -245,12 +430,12 @@ class IPythonSession:
             return None
         
         try:
-            # 直接使用 PlainTextFormatter
-            plain_formatter = self.shell.display_formatter.formatters['text/plain']
-            formatted_result = plain_formatter(result_obj)
-            
-            if formatted_result:
-                return formatted_result
+            # 直接使用缓存的 PlainTextFormatter
+            if self._plain_formatter is not None:
+                formatted_result = self._plain_formatter(result_obj)
+                
+                if formatted_result:
+                    return formatted_result
                 
         except Exception:
             # 如果直接格式化失败，使用回退方案
@@ -261,9 +446,11 @@ class IPythonSession:
     
     def execute_expression_only(self, code: str) -> ExecutionResult:
         """只执行表达式并返回结果，不捕获 print 输出 - 适用于纯表达式求值"""
-        self.last_used = datetime.now()
         start_time = time.time()
+        self.last_used = datetime.fromtimestamp(start_time)
         initial_memory = self._get_memory_usage()
+        # 用户代码可能修改命名空间
+        self._invalidate_ns_cache()
         
         try:
             # 确保使用无颜色模式
@@ -271,7 +458,11 @@ class IPythonSession:
             self.shell.colors = 'NoColor'
             
             # 直接执行，不捕获输出
-            execution_result = self.shell.run_cell(code, store_history=True)
+            try:
+                execution_result = self.shell.run_cell(code, store_history=True)
+            finally:
+                # 执行期间并发的工具调用可能用执行前的对象填充了缓存，执行结束后再清空一次
+                self._invalidate_ns_cache()
             
             # 恢复颜色设置
             self.shell.colors = original_colors
@@ -301,13 +492,10 @@ class IPythonSession:
                 'result': formatted_result,
                 'error': error_msg
             }
-            self.history.append(history_entry)
-            
-            # 保持历史记录在合理大小
-            if len(self.history) > 100:
-                self.history = self.history[-100:]
+            self._record_history(history_entry)
             
-            return ExecutionResult(
+            # 内部构造的可信数据，跳过 Pydantic 校验
+            return ExecutionResult.model_construct(
                 success=not bool(execution_result.error_in_exec),
                 execution_count=self.execution_count,
                 stdout="",  # 不返回 stdout
@@ -320,7 +508,10 @@ class IPythonSession:
             
         except Exception as e:
             execution_time = time.time() - start_time
-            error_msg = f"执行错误: {str(e)}\n{traceback.format_exc()}"
+            # 仅在调试模式下格式化完整堆栈
+            error_msg = f"执行错误: {str(e)}"
+            if self.debug:
+                error_msg += f"\n{traceback.format_exc()}"
             
             return ExecutionResult(
                 success=False,
@@ -335,18 +526,30 @@ class IPythonSession:
     
     def execute(self, code: str) -> ExecutionResult:
         """执行代码并返回结果 - 使用混合输出处理方案"""
-        self.last_used = datetime.now()
         start_time = time.time()
+        self.last_used = datetime.fromtimestamp(start_time)
         initial_memory = self._get_memory_usage()
+        # 用户代码可能修改命名空间
+        self._invalidate_ns_cache()
         
         try:
             # 确保使用无颜色模式
             original_colors = getattr(self.shell, 'colors', 'NoColor')
             self.shell.colors = 'NoColor'
             
-            # 使用 IPython 的 capture_output 捕获 print 输出和 stderr
-            with capture_output() as captured:
-                execution_result = self.shell.run_cell(code, store_history=True)
+            # 重定向到会话复用的缓冲区捕获 print 输出和 stderr
+            stdout_buf = self._stdout_buf
+            stderr_buf = self._stderr_buf
+            stdout_buf.seek(0)
+            stdout_buf.truncate()
+            stderr_buf.seek(0)
+            stderr_buf.truncate()
+            try:
+                with redirect_stdout(stdout_buf), redirect_stderr(stderr_buf):
+                    execution_result = self.shell.run_cell(code, store_history=True)
+            finally:
+                # 执行期间并发的工具调用可能用执行前的对象填充了缓存，执行结束后再清空一次
+                self._invalidate_ns_cache()
             
             # 恢复颜色设置
             self.shell.colors = original_colors
@@ -357,8 +560,8 @@ class IPythonSession:
             memory_delta = current_memory - initial_memory
             
             # 清理输出中可能残留的 ANSI 代码
-            stdout = remove_ansi_codes(captured.stdout)
-            stderr = remove_ansi_codes(captured.stderr)
+            stdout = remove_ansi_codes(stdout_buf.getvalue())
+            stderr = remove_ansi_codes(stderr_buf.getvalue())
             
             # 使用 DisplayFormatter 格式化表达式结果
             formatted_result = self._format_result(execution_result.result)
@@ -380,13 +583,10 @@ class IPythonSession:
                 'result': formatted_result,
                 'error': error_msg
             }
-            self.history.append(history_entry)
-            
-            # 保持历史记录在合理大小
-            if len(self.history) > 100:
-                self.history = self.history[-100:]
+            self._record_history(history_entry)
             
-            return ExecutionResult(
+            # 内部构造的可信数据，跳过 Pydantic 校验
+            return ExecutionResult.model_construct(
                 success=not bool(execution_result.error_in_exec),
                 execution_count=self.execution_count,
                 stdout=stdout,
@@ -399,7 +599,10 @@ class IPythonSession:
             
         except Exception as e:
             execution_time = time.time() - start_time
-            error_msg = f"执行错误: {str(e)}\n{traceback.format_exc()}"
+            # 仅在调试模式下格式化完整堆栈
+            error_msg = f"执行错误: {str(e)}"
+            if self.debug:
+                error_msg += f"\n{traceback.format_exc()}"
             
             return ExecutionResult(
                 success=False,
@@ -412,31 +615,74 @@ class IPythonSession:
                 error=remove_ansi_codes(error_msg)
             )
     
-    def get_variables(self) -> Dict[str, Any]:
-        """获取当前命名空间中的变量"""
+    def dataframe_memory(self, df: Any, deep: bool) -> int:
+        """统计 DataFrame 内存占用(字节)，深度统计结果按 id 和 shape 缓存"""
+        if not deep:
+            return int(df.memory_usage(deep=False).sum())
+        
+        key = id(df)
+        cached = self._mem_cache.get(key)
+        if cached is not None and cached[0] == df.shape:
+            return cached[1]
+        
+        usage = int(df.memory_usage(deep=True).sum())
+        self._mem_cache[key] = (df.shape, usage)
+        return usage
+    
+    def variable_nbytes(self, value: Any, deep: bool = False) -> int:
+        """估算变量占用的字节数
+        
+        pandas 对象的 sys.getsizeof 等同于 memory_usage(deep=True)，会遍历所有文本，
+        因此按 deep 参数显式选择统计方式；数组直接取 nbytes，其他对象使用 sys.getsizeof
+        """
+        if isinstance(value, _DATAFRAME_TYPES):
+            return self.dataframe_memory(value, deep)
+        if PANDAS_AVAILABLE and isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True, deep=deep))
+        nbytes = getattr(value, 'nbytes', None)
+        if isinstance(nbytes, int):
+            return nbytes
+        return sys.getsizeof(value)
+    
+    def is_user_variable(self, name: str) -> bool:
+        """判断名称是否为用户变量：排除下划线开头的名称以及 IPython 维护的隐藏名称 (In/Out/get_ipython/open 等)"""
+        return (not name.startswith('_') and name not in self.shell.user_ns_hidden
+                and name not in _HIDDEN_NAMES)
+    
+    def get_variables(self, detailed: bool = False) -> Dict[str, Any]:
+        """获取当前命名空间中的变量
+        
+        Args:
+            detailed: 是否对 DataFrame 做深度内存统计 (deep=True)，默认只做浅统计
+        """
         variables = {}
         user_ns = self.shell.user_ns
+        seen_ids = set()
         
         for name, value in user_ns.items():
-            if not name.startswith('_') and name not in ['In', 'Out', 'get_ipython', 'exit', 'quit']:
+            if self.is_user_variable(name):
                 try:
                     var_type = type(value).__name__
+                    size_bytes = self.variable_nbytes(value)
                     var_info = {
                         'type': var_type,
-                        'size_bytes': sys.getsizeof(value)
+                        'size_bytes': size_bytes
                     }
                     
-                    # 特殊处理不同类型的变量
-                    if hasattr(value, 'shape') and hasattr(value, 'dtypes'):  # DataFrame
+                    # 按类型分派，模块、函数、类等对象无需进一步探测
+                    if isinstance(value, _SKIP_TYPES):
+                        pass
+                    elif isinstance(value, _DATAFRAME_TYPES):
                         var_info.update({
                             'shape': list(value.shape),
-                            'columns': list(value.columns) if hasattr(value, 'columns') else None,
-                            'memory_usage': value.memory_usage(deep=True).sum() if hasattr(value, 'memory_usage') else None
+                            'columns': list(value.columns),
+                            'memory_usage': self.dataframe_memory(value, True) if detailed else size_bytes
                         })
-                    elif hasattr(value, 'shape'):  # numpy array
+                        seen_ids.add(id(value))
+                    elif isinstance(value, _ARRAY_TYPES):  # numpy array / Series
                         var_info.update({
                             'shape': list(value.shape),
-                            'dtype': str(value.dtype) if hasattr(value, 'dtype') else None
+                            'dtype': str(value.dtype)
                         })
                     elif isinstance(value, (list, tuple, dict, set)):
                         var_info['length'] = len(value)
@@ -446,21 +692,123 @@ class IPythonSession:
                 except Exception:
                     variables[name] = {'type': var_type, 'size_bytes': 0}
         
+        if detailed:
+            # 丢弃已不在命名空间中的 DataFrame 缓存
+            for key in self._mem_cache.keys() - seen_ids:
+                del self._mem_cache[key]
+        
         return variables
     
+    def _record_history(self, entry: Dict[str, Any]) -> None:
+        """记录一条执行历史，同时生成不含输出内容的精简记录"""
+        self.history.append(entry)
+        self.history_brief.append(
+            {k: v for k, v in entry.items() if k not in _HISTORY_OUTPUT_KEYS}
+        )
+    
+    def _invalidate_ns_cache(self) -> None:
+        """命名空间发生变化后清空依赖它的缓存"""
+        self._ns_version += 1
+        self._df_cache.clear()
+        self._dataframes = None
+        self._meta_cache.clear()
+        # 深度内存统计以 id 和 shape 为键，无法发现原地修改，需随命名空间变化一起清空
+        self._mem_cache.clear()
+    
+    def unique_var_name(self, base_name: str) -> str:
+        """生成不与命名空间冲突的 DataFrame 变量名 (df_文件名[_n])"""
+        # 从该文件名上次分配到的序号继续，批量加载同名文件时无需从头探测
+        counter = self._name_counters[base_name]
+        # 直接对 user_ns 的键视图做成员判断，无需 get_variables() 的变量探测
+        ns_keys = self.shell.user_ns.keys()
+        while True:
+            variable_name = f"df_{base_name}" if counter == 0 else f"df_{base_name}_{counter}"
+            counter += 1
+            if variable_name not in ns_keys:
+                break
+        self._name_counters[base_name] = counter
+        return variable_name
+    
+    def set_variable(self, name: str, value: Any) -> None:
+        """向会话命名空间写入变量"""
+        self.shell.user_ns[name] = value
+        self._invalidate_ns_cache()
+    
+    def delete_variables(self, names: List[str]) -> None:
+        """从会话命名空间删除变量"""
+        user_ns = self.shell.user_ns
+        for name in names:
+            del user_ns[name]
+        self._invalidate_ns_cache()
+    
+    def get_dataframes(self) -> Dict[str, Any]:
+        """获取命名空间中的全部 DataFrame，命名空间未变化时直接复用上次结果"""
+        if self._dataframes is not None:
+            return self._dataframes
+        
+        ns_version = self._ns_version
+        # 执行期间命名空间可能被并发修改，先取快照再遍历
+        dataframes = {
+            name: value for name, value in list(self.shell.user_ns.items())
+            if isinstance(value, _DATAFRAME_TYPES) and self.is_user_variable(name)
+        }
+        # 构建期间若有执行结束并清空了缓存，本次结果可能已过期，只返回不缓存
+        if ns_version == self._ns_version:
+            self._dataframes = dataframes
+        return dataframes
+    
+    def get_dataframe(self, name: str) -> Any:
+        """按名称获取命名空间中的对象，DataFrame 查找结果会被缓存"""
+        df = self._df_cache.get(name)
+        if df is not None:
+            return df
+        
+        ns_version = self._ns_version
+        value = self.shell.user_ns.get(name)
+        # 查找期间若有执行结束并清空了缓存，该结果可能已过期，不再写入
+        if isinstance(value, _DATAFRAME_TYPES) and ns_version == self._ns_version:
+            self._df_cache[name] = value
+        return value
+    
+    @property
+    def ns_version(self) -> int:
+        """命名空间版本号，每次清空缓存时递增"""
+        return self._ns_version
+    
+    def get_cached_meta(self, key: tuple, df: Any) -> Optional[Dict[str, Any]]:
+        """取出缓存的 DataFrame 分析结果，对象或形状已变化时视为未命中"""
+        entry = self._meta_cache.get(key)
+        if entry is not None and entry[0] == (id(df), df.shape):
+            return entry[1]
+        return None
+    
+    def set_cached_meta(self, key: tuple, df: Any, value: Dict[str, Any], ns_version: int) -> None:
+        """缓存 DataFrame 分析结果，以对象 id 和形状作为校验
+        
+        ns_version 为计算开始前取得的命名空间版本号，期间命名空间发生过变化时不写入
+        """
+        if ns_version == self._ns_version:
+            self._meta_cache[key] = ((id(df), df.shape), value)
+    
     def _get_memory_usage(self) -> float:
         """获取当前内存使用量(MB)"""
-        if not PSUTIL_AVAILABLE:
+        if self._proc is None:
             return 0.0
         try:
-            process = psutil.Process()
-            return process.memory_info().rss / 1024 / 1024
+            return self._proc.memory_info().rss * _MB
         except:
             return 0.0
     
-    def get_memory_info(self) -> Dict[str, Any]:
-        """获取详细内存信息"""
-        variables = self.get_variables()
+    def get_memory_info(self, detailed: bool = False,
+                        variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """获取详细内存信息
+        
+        Args:
+            detailed: 是否对 DataFrame 做深度内存统计，见 get_variables
+            variables: 已获取的 get_variables() 结果，提供时不再重复扫描命名空间
+        """
+        if variables is None:
+            variables = self.get_variables(detailed=detailed)
         
         # 按类型分组统计内存使用
         breakdown = {
@@ -474,12 +822,12 @@ class IPythonSession:
         top_variables = []
         
         for name, var_info in variables.items():
-            memory_mb = var_info.get('size_bytes', 0) / 1024 / 1024
+            memory_mb = var_info.get('size_bytes', 0) * _MB
             var_type = var_info.get('type', 'unknown')
             
             # 特殊处理 DataFrame 内存使用
             if 'memory_usage' in var_info and var_info['memory_usage']:
-                memory_mb = var_info['memory_usage'] / 1024 / 1024
+                memory_mb = var_info['memory_usage'] * _MB
             
             top_variables.append({
                 'name': name,
@@ -488,16 +836,7 @@ class IPythonSession:
             })
             
             # 分类统计
-            if 'DataFrame' in var_type:
-                breakdown['dataframes'] += memory_mb
-            elif var_type in ['list', 'tuple', 'set']:
-                breakdown['lists'] += memory_mb
-            elif var_type in ['int', 'float', 'str', 'bool']:
-                breakdown['scalars'] += memory_mb
-            elif 'function' in var_type.lower():
-                breakdown['functions'] += memory_mb
-            else:
-                breakdown['others'] += memory_mb
+            breakdown[_type_bucket(var_type)] += memory_mb
         
         # 按内存使用排序
         top_variables.sort(key=lambda x: x['memory_mb'], reverse=True)
@@ -531,7 +870,8 @@ class IPythonSessionManager:
         self.sessions: Dict[str, IPythonSession] = {}
         self.lock = threading.Lock()
     
-    def create_session(self, session_id: Optional[str] = None, auto_import: bool = True) -> str:
+    def create_session(self, session_id: Optional[str] = None, auto_import: bool = True,
+                       debug: bool = False) -> str:
         """创建新会话"""
         with self.lock:
             if session_id is None:
@@ -540,7 +880,7 @@ class IPythonSessionManager:
             if session_id in self.sessions:
                 raise ValueError(f"Session {session_id} already exists")
             
-            session = IPythonSession(session_id, auto_import)
+            session = IPythonSession(session_id, auto_import, debug)
             self.sessions[session_id] = session
             return session_id
     
@@ -565,9 +905,10 @@ class IPythonSessionManager:
             sessions = []
             for session_id, session in self.sessions.items():
                 variables = session.get_variables()
-                memory_info = session.get_memory_info()
+                memory_info = session.get_memory_info(variables=variables)
                 
-                sessions.append(SessionInfo(
+                # 字段均为已知类型的基本值，跳过 pydantic 校验直接构造
+                sessions.append(SessionInfo.model_construct(
                     session_id=session_id,
                     status="active",
                     created_at=session.created_at.isoformat(),
@@ -581,35 +922,109 @@ class IPythonSessionManager:
 class DataLoader:
     """数据加载器"""
     
+    @staticmethod
+    def _check_path(file_path: str) -> Path:
+        """检查文件是否存在，返回 Path 对象供后续复用"""
+        path = Path(file_path)
+        try:
+            path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {file_path}")
+        return path
+    
     @staticmethod
     def detect_encoding(file_path: str) -> str:
         """自动检测文件编码"""
         encodings = ['utf-8', 'gb18030', 'gbk', 'gb2312', 'latin-1']
         
+        # 只打开一次文件，读取前 64KB 在内存中逐个尝试解码
+        with open(file_path, 'rb') as f:
+            raw = f.read(_ENCODING_SNIFF_BYTES)
+        is_complete = len(raw) < _ENCODING_SNIFF_BYTES
+        
+        # 带 BOM 的文件无需逐个尝试
+        if raw.startswith(codecs.BOM_UTF8):
+            return 'utf-8'  # pandas 和 Arrow 读取 utf-8 时都会跳过 BOM
+        if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        
         for encoding in encodings:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    f.read(1024)  # 读取一部分内容进行测试
+                # 增量解码器可容忍截断在多字节字符中间的尾部
+                codecs.getincrementaldecoder(encoding)().decode(raw, final=is_complete)
                 return encoding
             except (UnicodeDecodeError, UnicodeError):
                 continue
         
         return 'utf-8'  # 默认编码
     
+    @staticmethod
+    def _read_csv_arrow(file_path: str, encoding: str) -> Optional[Any]:
+        """用多线程的 Arrow CSV 读取器加载，结果与 C 引擎保持一致；无法保证一致时返回 None"""
+        try:
+            # 列名沿用 pandas 的处理（重复列名改为 a.1、空列名改为 Unnamed: n）
+            names = pd.read_csv(file_path, encoding=encoding, nrows=0).columns.tolist()
+            read_options = pacsv.ReadOptions(encoding=encoding)
+            # 文本列同样按 pandas 的空值规则识别 NA、空单元格等
+            convert_options = pacsv.ConvertOptions(strings_can_be_null=True, null_values=_CSV_NA_VALUES)
+            table = pacsv.read_csv(file_path, read_options=read_options, convert_options=convert_options)
+            if table.num_columns != len(names):
+                return None
+            
+            # C 引擎不推断日期时间，Arrow 推断出的日期/时间列按原始文本重新读取
+            raw_names = table.column_names
+            temporal = {raw_names[i] for i, field in enumerate(table.schema)
+                        if pa.types.is_temporal(field.type)}
+            if temporal:
+                if sum(raw_names.count(name) for name in temporal) != len(temporal):
+                    return None  # 同名列无法按列名单独指定类型
+                convert_options.column_types = {name: pa.string() for name in temporal}
+                del table
+                table = pacsv.read_csv(file_path, read_options=read_options, convert_options=convert_options)
+            
+            table = table.rename_columns(names)
+            # self_destruct 在转换过程中逐列释放 Arrow 缓冲区，降低峰值内存
+            df = table.to_pandas(self_destruct=True, split_blocks=True)
+            del table
+            return df
+        except Exception:
+            # pyarrow 无法解析时由调用方回退到默认 C 引擎
+            return None
+    
     @staticmethod
     def load_csv(file_path: str, encoding: str = "auto") -> tuple:
         """加载 CSV 文件"""
         if not PANDAS_AVAILABLE:
             raise ImportError("pandas is required for CSV loading")
         
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        DataLoader._check_path(file_path)
         
         if encoding == "auto":
             encoding = DataLoader.detect_encoding(file_path)
         
         start_time = time.time()
-        df = pd.read_csv(file_path, encoding=encoding)
+        df = DataLoader._read_csv_arrow(file_path, encoding) if PYARROW_AVAILABLE else None
+        if df is None:
+            df = pd.read_csv(file_path, encoding=encoding)
+        load_time = time.time() - start_time
+        
+        return df, encoding, load_time
+    
+    @staticmethod
+    def load_csv_columns(file_path: str, columns: Optional[List[str]] = None,
+                         nrows: Optional[int] = 10_000, encoding: str = "auto") -> tuple:
+        """只加载 CSV 文件的部分列和前若干行，避免读取用不到的数据"""
+        if not PANDAS_AVAILABLE:
+            raise ImportError("pandas is required for CSV loading")
+        
+        DataLoader._check_path(file_path)
+        
+        if encoding == "auto":
+            encoding = DataLoader.detect_encoding(file_path)
+        
+        start_time = time.time()
+        # C 引擎支持 nrows 提前停止读取，pyarrow 引擎总是解析整个文件
+        df = pd.read_csv(file_path, encoding=encoding, usecols=columns, nrows=nrows)
         load_time = time.time() - start_time
         
         return df, encoding, load_time
@@ -623,13 +1038,15 @@ class DataLoader:
         if not EXCEL_AVAILABLE:
             raise ImportError("Excel support libraries are required. Install with: pip install openpyxl xlrd")
         
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        path = DataLoader._check_path(file_path)
         
         # 检测文件扩展名并选择合适的引擎
-        file_extension = Path(file_path).suffix.lower()
+        file_extension = path.suffix.lower()
         
-        if file_extension == '.xlsx':
+        if EXCEL_CALAMINE_AVAILABLE and file_extension in ['.xlsx', '.xls']:
+            # 优先使用 calamine 引擎，解析速度远快于 openpyxl/xlrd
+            engine = 'calamine'
+        elif file_extension == '.xlsx':
             if not EXCEL_XLSX_AVAILABLE:
                 raise ImportError("openpyxl is required for .xlsx files. Install with: pip install openpyxl")
             engine = 'openpyxl'
@@ -645,9 +1062,20 @@ class DataLoader:
         try:
             df = pd.read_excel(file_path, sheet_name=sheet_name, engine=engine)
         except Exception as e:
-            if engine is None and file_extension not in ['.xlsx', '.xls']:
+            if engine == 'calamine':
+                # calamine 解析失败时回退到传统引擎
+                if file_extension == '.xlsx' and EXCEL_XLSX_AVAILABLE:
+                    df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+                elif file_extension == '.xls' and EXCEL_XLS_AVAILABLE:
+                    df = pd.read_excel(file_path, sheet_name=sheet_name, engine='xlrd')
+                else:
+                    raise e
+            elif engine is None and file_extension not in ['.xlsx', '.xls']:
                 # 尝试不同的引擎
-                for alt_engine in ['openpyxl', 'xlrd']:
+                alt_engines = ['openpyxl', 'xlrd']
+                if EXCEL_CALAMINE_AVAILABLE:
+                    alt_engines.insert(0, 'calamine')
+                for alt_engine in alt_engines:
                     try:
                         df = pd.read_excel(file_path, sheet_name=sheet_name, engine=alt_engine)
                         break
@@ -668,22 +1096,173 @@ class DataLoader:
         if not PANDAS_AVAILABLE:
             raise ImportError("pandas is required for JSON loading")
         
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        DataLoader._check_path(file_path)
         
         start_time = time.time()
+        # read_json 的轴标签、数值类型和日期列转换规则无法用 DataFrame 构造器简单复现
         df = pd.read_json(file_path)
         load_time = time.time() - start_time
         
         return df, load_time
 
+# 全局会话管理器，模块加载时创建，避免惰性初始化的竞争条件
+_session_manager = IPythonSessionManager()
+
 def get_session_manager() -> IPythonSessionManager:
     """获取全局会话管理器"""
-    global _session_manager
-    if _session_manager is None:
-        _session_manager = IPythonSessionManager()
     return _session_manager
 
+def _df_meta(df: Any, deep: bool = True) -> tuple:
+    """一次性获取 DataFrame 的 dtype 字典、总内存(MB)和每列内存(字节)
+    
+    deep 为 False 时只做浅统计；即使 deep 为 True，也只有存在 object 类型的列时
+    才做深度内存统计，纯数值列的浅统计结果已是精确值
+    """
+    dtypes = df.dtypes
+    dtypes_dict = dtypes.astype(str).to_dict()
+    has_object = deep and any(dtype.kind == 'O' for dtype in dtypes)
+    memory_usage = df.memory_usage(deep=has_object)
+    return dtypes_dict, memory_usage.sum() * _MB, memory_usage
+
+def _json_column_values(series: Any) -> List[Any]:
+    """将一列转换为可直接 JSON 序列化的 Python 值列表
+    
+    空值转为 None，日期时间转为 ISO 字符串，其余值由 tolist() 装箱，浮点数保持完整精度
+    """
+    if series.dtype.kind == 'M':
+        values = [value.isoformat() for value in series]
+    else:
+        values = series.tolist()
+    null_mask = series.isna().to_numpy()
+    if null_mask.any():
+        for i in np.flatnonzero(null_mask):
+            values[i] = None
+    return values
+
+def _json_records(df: Any) -> List[Dict[Any, Any]]:
+    """按列转换后组装为记录列表，结果与 to_dict('records') 一致但不含 NaN/Timestamp"""
+    if df.shape[1] == 0:
+        return [{} for _ in range(len(df))]
+    columns = df.columns.tolist()
+    column_values = [_json_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+    return [dict(zip(columns, row)) for row in zip(*column_values)]
+
+def _unique_labels(labels: List[Any]) -> List[Any]:
+    """按 pandas 读取 CSV 的规则为重名列加 .1、.2 后缀，首次出现的列名保持不变"""
+    seen = set(labels)
+    counts: Counter = Counter()
+    result = []
+    for label in labels:
+        if counts[label]:
+            new_label = f"{label}.{counts[label]}"
+            while new_label in seen:
+                counts[label] += 1
+                new_label = f"{label}.{counts[label]}"
+            seen.add(new_label)
+            result.append(new_label)
+        else:
+            result.append(label)
+        counts[label] += 1
+    return result
+
+def _downcast(df: Any) -> Any:
+    """原地压缩 DataFrame 的列类型以降低内存占用
+    
+    整数列降到能容纳数据的最小位宽，唯一值占比低于一半的文本列转为 category；
+    浮点列降为 float32 会丢失精度 (0.1 变为 0.10000000149011612)，因此保持不变
+    """
+    # 重名列无法按列名逐列回写，保持原样
+    if not df.columns.is_unique:
+        return df
+    n_rows = len(df)
+    for col, series in list(df.items()):
+        kind = series.dtype.kind
+        if kind == 'i':
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif kind == 'u':
+            df[col] = pd.to_numeric(series, downcast='unsigned')
+        elif kind == 'O' and n_rows and not isinstance(series.dtype, pd.CategoricalDtype):
+            try:
+                if series.nunique() / n_rows < 0.5:
+                    df[col] = series.astype('category')
+            except TypeError:
+                # 列表/字典等不可哈希的值无法转为 category
+                continue
+    return df
+
+def _dataframe_variable_info(var: Any, result: Dict[str, Any], include_preview: bool) -> None:
+    """填充 DataFrame 变量的形状、列信息和预览"""
+    result["size_info"].update({
+        "shape": list(var.shape),
+        "element_count": var.size
+    })
+    # 宽表只列出前 _INFO_MAX_COLUMNS 列，元数据开销不随列数增长
+    shown_columns = var.columns[:_INFO_MAX_COLUMNS]
+    result["additional_info"] = {
+        "columns": shown_columns.tolist(),
+        "dtypes": dict(zip(shown_columns, var.dtypes.iloc[:_INFO_MAX_COLUMNS].astype(str)))
+    }
+    if len(var.columns) > _INFO_MAX_COLUMNS:
+        result["additional_info"].update({
+            "dtypes_truncated": True,
+            "columns_shown": _INFO_MAX_COLUMNS,
+            "total_columns": len(var.columns)
+        })
+    if include_preview:
+        # 限制列数和单元格宽度，宽表的预览开销与列数无关
+        result["content_preview"] = var.head(5).to_string(
+            max_cols=10, max_colwidth=40, show_dimensions=False
+        )
+
+def _array_variable_info(var: Any, result: Dict[str, Any], include_preview: bool) -> None:
+    """填充 numpy 数组、Series 等带 shape 对象的形状、dtype 和预览"""
+    result["size_info"].update({
+        "shape": list(var.shape),
+        "element_count": var.size
+    })
+    result["additional_info"] = {
+        "dtype": str(var.dtype) if hasattr(var, 'dtype') else None
+    }
+    if include_preview:
+        result["content_preview"] = str(var)
+
+def _container_variable_info(var: Any, result: Dict[str, Any], include_preview: bool) -> None:
+    """填充列表、元组、字典、集合的元素数和预览"""
+    result["size_info"]["element_count"] = len(var)
+    if include_preview:
+        result["content_preview"] = _bounded_repr(var)
+
+def _object_variable_info(var: Any, result: Dict[str, Any], include_preview: bool) -> None:
+    """其他对象只提供预览"""
+    if include_preview:
+        result["content_preview"] = _bounded_repr(var)
+
+# 变量类型 -> get_variable_info 的信息处理函数，子类按 MRO 匹配
+_VARIABLE_INFO_HANDLERS: Dict[type, Callable[[Any, Dict[str, Any], bool], None]] = {
+    list: _container_variable_info,
+    tuple: _container_variable_info,
+    dict: _container_variable_info,
+    set: _container_variable_info
+}
+if PANDAS_AVAILABLE:
+    _VARIABLE_INFO_HANDLERS.update({
+        pd.DataFrame: _dataframe_variable_info,
+        pd.Series: _array_variable_info,
+        np.ndarray: _array_variable_info
+    })
+
+@lru_cache(maxsize=256)
+def _variable_info_handler(var_cls: type) -> Callable[[Any, Dict[str, Any], bool], None]:
+    """查找变量类型对应的信息处理函数，结果按类型缓存"""
+    for base in var_cls.__mro__:
+        handler = _VARIABLE_INFO_HANDLERS.get(base)
+        if handler is not None:
+            return handler
+    # 未登记的类数组对象 (如其他库的张量) 按数组处理
+    if hasattr(var_cls, 'shape'):
+        return _array_variable_info
+    return _object_variable_info
+
 # =============================================================================
 # MCP 工具函数实现
 # =============================================================================
@@ -691,7 +1270,8 @@ def get_session_manager() -> IPythonSessionManager:
 @mcp.tool()
 def create_ipython_session(
     session_id: Optional[str] = None,
-    auto_import: bool = True
+    auto_import: bool = True,
+    debug: bool = False
 ) -> Dict[str, Any]:
     """
     创建新的 IPython 会话
@@ -705,6 +1285,7 @@ def create_ipython_session(
     Args:
         session_id: 会话ID，可选，不提供则自动生成 (格式: session_xxxxxxxx)
         auto_import: 是否自动导入常用库 (pandas, numpy, json, os, sys, pathlib)
+        debug: 调试模式，执行过程出现内部异常时在 error 中附带完整堆栈
     
     Returns:
         Dict: 包含会话创建结果的字典
@@ -730,7 +1311,7 @@ def create_ipython_session(
             }
         
         manager = get_session_manager()
-        created_session_id = manager.create_session(session_id, auto_import)
+        created_session_id = manager.create_session(session_id, auto_import, debug)
         
         auto_imported = []
         if auto_import:
@@ -783,7 +1364,8 @@ def list_ipython_sessions() -> Dict[str, Any]:
         
         return {
             "success": True,
-            "sessions": [session.model_dump() for session in sessions],
+            # 字段均为基本类型，浅拷贝即可，无需 model_dump 的完整序列化流程
+            "sessions": [dict(session) for session in sessions],
             "total_sessions": len(sessions)
         }
         
@@ -820,30 +1402,14 @@ def get_session_status(session_id: str) -> Dict[str, Any]:
         session = manager.get_session(session_id)
         
         variables = session.get_variables()
-        memory_info = session.get_memory_info()
+        memory_info = session.get_memory_info(variables=variables)
         
         # 按类型统计变量
+        buckets = Counter(_type_bucket(var_info.get('type', 'unknown')) for var_info in variables.values())
         variable_summary = {
-            'dataframes': 0,
-            'lists': 0,
-            'scalars': 0,
-            'functions': 0,
-            'others': 0
+            key: buckets[key] for key in ('dataframes', 'lists', 'scalars', 'functions', 'others')
         }
         
-        for var_info in variables.values():
-            var_type = var_info.get('type', 'unknown')
-            if 'DataFrame' in var_type:
-                variable_summary['dataframes'] += 1
-            elif var_type in ['list', 'tuple', 'set']:
-                variable_summary['lists'] += 1
-            elif var_type in ['int', 'float', 'str', 'bool']:
-                variable_summary['scalars'] += 1
-            elif 'function' in var_type.lower():
-                variable_summary['functions'] += 1
-            else:
-                variable_summary['others'] += 1
-        
         return {
             "success": True,
             "session_info": {
@@ -1056,15 +1622,13 @@ def get_execution_history(
         manager = get_session_manager()
         session = manager.get_session(session_id)
         
-        history = session.history[-limit:] if limit > 0 else session.history
+        # 不包含输出时直接使用写入时生成的精简记录
+        source = session.history if include_output else session.history_brief
         
-        if not include_output:
-            # 移除输出内容以节省空间
-            history = [
-                {k: v for k, v in entry.items() 
-                 if k not in ['stdout', 'stderr', 'result']}
-                for entry in history
-            ]
+        # deque 不支持切片，使用 islice 取最近 limit 条
+        total = len(source)
+        start = max(total - limit, 0) if limit > 0 else 0
+        history = list(islice(source, start, None))
         
         return {
             "success": True,
@@ -1088,7 +1652,11 @@ def load_csv_file(
     file_path: str,
     session_id: str,
     variable_name: Optional[str] = None,
-    encoding: str = "auto"
+    encoding: str = "auto",
+    columns: Optional[List[str]] = None,
+    nrows: Optional[int] = None,
+    downcast: bool = False,
+    include_memory: bool = False
 ) -> Dict[str, Any]:
     """
     加载 CSV 文件到 DataFrame
@@ -1105,6 +1673,10 @@ def load_csv_file(
         session_id: 目标会话ID
         variable_name: 存储的变量名，不提供则自动生成 (格式: df_文件名)
         encoding: 文件编码，"auto"为自动检测，支持 utf-8, gbk, gb2312 等
+        columns: 只加载指定的列，不提供则加载全部列
+        nrows: 只加载前 n 行，不提供则加载全部行
+        downcast: 是否压缩列类型 (整数列降位宽、低基数文本列转 category) 以减少内存占用，浮点列保持原精度
+        include_memory: 是否深度统计文本列的内存，默认只做浅统计 (文本列按指针大小计)
     
     Returns:
         Dict: 加载结果，包含 DataFrame 信息
@@ -1131,6 +1703,14 @@ def load_csv_file(
         session_id="session_a1b2c3d4",
         encoding="auto"  # 默认值
     )
+    
+    # 大文件只加载需要的列和前1万行
+    result = load_csv_file(
+        file_path="large_data.csv",
+        session_id="session_a1b2c3d4",
+        columns=["date", "amount"],
+        nrows=10000
+    )
     ```
     
     返回格式:
@@ -1147,27 +1727,26 @@ def load_csv_file(
         manager = get_session_manager()
         session = manager.get_session(session_id)
         
-        # 加载数据
-        df, detected_encoding, load_time = DataLoader.load_csv(file_path, encoding)
+        # 加载数据，指定列或行数时只读取需要的部分
+        if columns is not None or nrows is not None:
+            df, detected_encoding, load_time = DataLoader.load_csv_columns(
+                file_path, columns, nrows, encoding
+            )
+        else:
+            df, detected_encoding, load_time = DataLoader.load_csv(file_path, encoding)
+        
+        if downcast:
+            df = _downcast(df)
         
         # 生成变量名
         if variable_name is None:
-            base_name = Path(file_path).stem
-            variable_name = f"df_{base_name}"
-            
-            # 确保变量名不冲突
-            variables = session.get_variables()
-            counter = 1
-            while variable_name in variables:
-                variable_name = f"df_{base_name}_{counter}"
-                counter += 1
+            variable_name = session.unique_var_name(Path(file_path).stem)
         
         # 将DataFrame添加到会话命名空间
-        session.shell.user_ns[variable_name] = df
+        session.set_variable(variable_name, df)
         
         # 获取DataFrame信息
-        dtypes_dict = {col: str(dtype) for col, dtype in df.dtypes.items()}
-        memory_usage_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+        dtypes_dict, memory_usage_mb, _ = _df_meta(df, deep=include_memory)
         
         return {
             "success": True,
@@ -1201,7 +1780,9 @@ def load_excel_file(
     file_path: str,
     session_id: str,
     variable_name: Optional[str] = None,
-    sheet_name: Union[str, int] = 0
+    sheet_name: Union[str, int] = 0,
+    downcast: bool = False,
+    include_memory: bool = False
 ) -> Dict[str, Any]:
     """
     加载 Excel 文件到 DataFrame
@@ -1216,6 +1797,8 @@ def load_excel_file(
         session_id: 会话ID
         variable_name: 变量名，不提供则自动生成
         sheet_name: 工作表名称或索引 (默认0)
+        downcast: 是否压缩列类型 (整数列降位宽、低基数文本列转 category) 以减少内存占用，浮点列保持原精度
+        include_memory: 是否深度统计文本列的内存，默认只做浅统计 (文本列按指针大小计)
     
     调用样例:
     ```python
@@ -1249,24 +1832,18 @@ def load_excel_file(
         # 加载数据
         df, load_time = DataLoader.load_excel(file_path, sheet_name)
         
+        if downcast:
+            df = _downcast(df)
+        
         # 生成变量名
         if variable_name is None:
-            base_name = Path(file_path).stem
-            variable_name = f"df_{base_name}"
-            
-            # 确保变量名不冲突
-            variables = session.get_variables()
-            counter = 1
-            while variable_name in variables:
-                variable_name = f"df_{base_name}_{counter}"
-                counter += 1
+            variable_name = session.unique_var_name(Path(file_path).stem)
         
         # 将DataFrame添加到会话命名空间
-        session.shell.user_ns[variable_name] = df
+        session.set_variable(variable_name, df)
         
         # 获取DataFrame信息
-        dtypes_dict = {col: str(dtype) for col, dtype in df.dtypes.items()}
-        memory_usage_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+        dtypes_dict, memory_usage_mb, _ = _df_meta(df, deep=include_memory)
         
         return {
             "success": True,
@@ -1299,7 +1876,9 @@ def load_excel_file(
 def load_json_file(
     file_path: str,
     session_id: str,
-    variable_name: Optional[str] = None
+    variable_name: Optional[str] = None,
+    downcast: bool = False,
+    include_memory: bool = False
 ) -> Dict[str, Any]:
     """
     加载 JSON 文件到 DataFrame
@@ -1313,6 +1892,8 @@ def load_json_file(
         file_path: JSON文件路径
         session_id: 会话ID
         variable_name: 变量名，不提供则自动生成
+        downcast: 是否压缩列类型 (整数列降位宽、低基数文本列转 category) 以减少内存占用，浮点列保持原精度
+        include_memory: 是否深度统计文本列的内存，默认只做浅统计 (文本列按指针大小计)
     
     调用样例:
     ```python
@@ -1336,24 +1917,18 @@ def load_json_file(
         # 加载数据
         df, load_time = DataLoader.load_json(file_path)
         
+        if downcast:
+            df = _downcast(df)
+        
         # 生成变量名
         if variable_name is None:
-            base_name = Path(file_path).stem
-            variable_name = f"df_{base_name}"
-            
-            # 确保变量名不冲突
-            variables = session.get_variables()
-            counter = 1
-            while variable_name in variables:
-                variable_name = f"df_{base_name}_{counter}"
-                counter += 1
+            variable_name = session.unique_var_name(Path(file_path).stem)
         
         # 将DataFrame添加到会话命名空间
-        session.shell.user_ns[variable_name] = df
+        session.set_variable(variable_name, df)
         
         # 获取DataFrame信息
-        dtypes_dict = {col: str(dtype) for col, dtype in df.dtypes.items()}
-        memory_usage_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+        dtypes_dict, memory_usage_mb, _ = _df_meta(df, deep=include_memory)
         
         return {
             "success": True,
@@ -1408,24 +1983,20 @@ def list_dataframes(session_id: str) -> Dict[str, Any]:
         manager = get_session_manager()
         session = manager.get_session(session_id)
         
-        variables = session.get_variables()
         dataframes = []
         total_memory = 0.0
         
-        for name, var_info in variables.items():
-            if 'DataFrame' in var_info.get('type', ''):
-                # 获取DataFrame对象
-                df = session.shell.user_ns.get(name)
-                if df is not None and hasattr(df, 'shape'):
-                    memory_mb = var_info.get('memory_usage', 0) / 1024 / 1024 if var_info.get('memory_usage') else 0
-                    total_memory += memory_mb
-                    
-                    dataframes.append({
-                        "name": name,
-                        "shape": list(df.shape),
-                        "memory_mb": round(memory_mb, 2),
-                        "columns": list(df.columns)[:10]  # 只显示前10列
-                    })
+        # 使用会话维护的 DataFrame 登记表，无需扫描并探测全部变量
+        for name, df in session.get_dataframes().items():
+            memory_mb = session.dataframe_memory(df, False) * _MB
+            total_memory += memory_mb
+            
+            dataframes.append({
+                "name": name,
+                "shape": list(df.shape),
+                "memory_mb": round(memory_mb, 2),
+                "columns": df.columns[:10].tolist()  # 只显示前10列
+            })
         
         return {
             "success": True,
@@ -1448,7 +2019,8 @@ def list_dataframes(session_id: str) -> Dict[str, Any]:
 @mcp.tool()
 def get_dataframe_info(
     variable_name: str,
-    session_id: str
+    session_id: str,
+    deep: bool = False
 ) -> Dict[str, Any]:
     """
     获取指定 DataFrame 的详细信息
@@ -1463,6 +2035,7 @@ def get_dataframe_info(
     Args:
         variable_name: 会话中 DataFrame 变量的名称
         session_id: 会话ID
+        deep: 是否深度统计文本列的内存，大表上较慢，默认只做浅统计
     
     Returns:
         Dict: DataFrame详细信息
@@ -1492,26 +2065,33 @@ def get_dataframe_info(
         session = manager.get_session(session_id)
         
         # 获取DataFrame对象
-        df = session.shell.user_ns.get(variable_name)
+        ns_version = session.ns_version
+        df = session.get_dataframe(variable_name)
         if df is None:
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' not found in session"
             }
         
-        if not hasattr(df, 'shape') or not hasattr(df, 'dtypes'):
+        if not isinstance(df, _DATAFRAME_TYPES):
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' is not a DataFrame"
             }
         
+        # 命名空间未变化时直接复用上次的结果
+        cache_key = ('info', variable_name, deep)
+        cached = session.get_cached_meta(cache_key, df)
+        if cached is not None:
+            return cached
+        
         # 获取详细信息
-        dtypes_dict = {col: str(dtype) for col, dtype in df.dtypes.items()}
-        memory_usage = df.memory_usage(deep=True)
-        total_memory_mb = memory_usage.sum() / 1024 / 1024
+        dtypes_dict, total_memory_mb, memory_usage = _df_meta(df, deep=deep)
         
         per_column_kb = {col: round(memory_usage[col] / 1024, 1) for col in df.columns}
-        null_counts = df.isnull().sum().to_dict()
+        # 逐列计数，避免生成与原表同样大小的布尔 DataFrame
+        n_rows = len(df)
+        null_counts = {col: n_rows - int(series.count()) for col, series in df.items()}
         
         # 索引信息
         index_info = {
@@ -1521,7 +2101,7 @@ def get_dataframe_info(
             "step": 1 if isinstance(df.index, pd.RangeIndex) else None
         }
         
-        return {
+        result = {
             "success": True,
             "variable_name": variable_name,
             "shape": list(df.shape),
@@ -1534,6 +2114,8 @@ def get_dataframe_info(
             "null_counts": null_counts,
             "index_info": index_info
         }
+        session.set_cached_meta(cache_key, df, result, ns_version)
+        return result
         
     except ValueError as e:
         return {
@@ -1551,7 +2133,8 @@ def preview_dataframe(
     variable_name: str,
     session_id: str,
     method: str = "head",
-    n_rows: int = 5
+    n_rows: int = 5,
+    data_format: str = "records"
 ) -> Dict[str, Any]:
     """
     预览 DataFrame 数据
@@ -1559,13 +2142,16 @@ def preview_dataframe(
     功能说明:
     - 预览DataFrame的数据内容
     - 支持头部、尾部、随机采样三种方式
-    - 返回易读的记录格式
+    - 返回易读的记录格式，或更紧凑的按列格式
     
     Args:
         variable_name: DataFrame变量名
         session_id: 会话ID
         method: 预览方法 ("head", "tail", "sample")
         n_rows: 行数
+        data_format: 数据格式 ("records" 每行一个字典; "columns" 每列一个列表，列名只出现一次;
+                     "jsonl" 每行一个 JSON 对象的文本，浮点数保留 15 位有效数字，
+                     重名列依次加 .1、.2 后缀，多级列名以元组文本作为键)
     
     调用样例:
     ```python
@@ -1574,10 +2160,19 @@ def preview_dataframe(
     
     # 随机采样10行
     result = preview_dataframe("df", "session_a1b2c3d4", "sample", 10)
+    
+    # 按列格式预览100行，减少返回数据量
+    result = preview_dataframe("df", "session_a1b2c3d4", "head", 100, data_format="columns")
+    
+    # 以 JSON Lines 文本返回1000行
+    result = preview_dataframe("df", "session_a1b2c3d4", "head", 1000, data_format="jsonl")
     ```
     
     返回格式:
-    成功时包含: success, variable_name, method, n_rows, data (记录列表), total_rows
+    成功时包含: success, variable_name, method, n_rows, data, total_rows
+    data_format="records" 时 data 为记录列表
+    data_format="columns" 时额外包含 columns (列名列表)，data 为与之对应的列值列表
+    data_format="jsonl" 时 data 为 JSON Lines 字符串，每行一条记录
     失败时包含: success, error
     """
     try:
@@ -1585,19 +2180,25 @@ def preview_dataframe(
         session = manager.get_session(session_id)
         
         # 获取DataFrame对象
-        df = session.shell.user_ns.get(variable_name)
+        df = session.get_dataframe(variable_name)
         if df is None:
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' not found in session"
             }
         
-        if not hasattr(df, 'shape'):
+        if not isinstance(df, _DATAFRAME_TYPES):
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' is not a DataFrame"
             }
         
+        if data_format not in ("records", "columns", "jsonl"):
+            return {
+                "success": False,
+                "error": f"Invalid data_format '{data_format}'. Use 'records', 'columns' or 'jsonl'"
+            }
+        
         # 根据方法获取数据
         if method == "head":
             preview_df = df.head(n_rows)
@@ -1605,25 +2206,44 @@ def preview_dataframe(
             preview_df = df.tail(n_rows)
         elif method == "sample":
             n_rows = min(n_rows, len(df))  # 确保不超过实际行数
-            preview_df = df.sample(n_rows) if len(df) > 0 else df.head(0)
+            # 只生成 n_rows 个不重复的位置再 iloc 取行，避免 df.sample 对全表做排列
+            positions = _RNG.choice(len(df), size=n_rows, replace=False)
+            preview_df = df.iloc[positions]
         else:
             return {
                 "success": False,
                 "error": f"Invalid method '{method}'. Use 'head', 'tail', or 'sample'"
             }
         
-        # 转换为记录格式
-        data = preview_df.to_dict('records')
-        
-        return {
+        result = {
             "success": True,
             "variable_name": variable_name,
             "method": method,
             "n_rows": len(preview_df),
-            "data": data,
             "total_rows": len(df)
         }
         
+        if data_format == "jsonl":
+            # to_json 要求列名唯一，重名列先改名，避免记录中同名键互相覆盖
+            if not preview_df.columns.is_unique:
+                preview_df = preview_df.set_axis(_unique_labels(preview_df.columns.tolist()), axis=1)
+            result["data"] = preview_df.to_json(
+                orient="records", lines=True, double_precision=15,
+                date_format="iso", default_handler=str
+            )
+        elif data_format == "columns":
+            # 按列格式：列名只出现一次，每列序列化为一个值列表
+            result["columns"] = preview_df.columns.tolist()
+            result["data"] = [
+                _json_column_values(preview_df.iloc[:, i])
+                for i in range(preview_df.shape[1])
+            ]
+        else:
+            # 转换为记录格式：逐列转换空值和日期时间，数值保持原始精度
+            result["data"] = _json_records(preview_df)
+        
+        return result
+        
     except ValueError as e:
         return {
             "success": False,
@@ -1668,19 +2288,26 @@ def get_dataframe_summary(
         session = manager.get_session(session_id)
         
         # 获取DataFrame对象
-        df = session.shell.user_ns.get(variable_name)
+        ns_version = session.ns_version
+        df = session.get_dataframe(variable_name)
         if df is None:
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' not found in session"
             }
         
-        if not hasattr(df, 'describe'):
+        if not isinstance(df, _DATAFRAME_TYPES):
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' is not a DataFrame"
             }
         
+        # 命名空间未变化时直接复用上次的结果
+        cache_key = ('summary', variable_name, include_categorical)
+        cached = session.get_cached_meta(cache_key, df)
+        if cached is not None:
+            return cached
+        
         result = {
             "success": True,
             "variable_name": variable_name
@@ -1699,9 +2326,11 @@ def get_dataframe_summary(
         if include_categorical:
             categorical_df = df.select_dtypes(include=['object', 'category'])
             if len(categorical_df.columns) > 0:
+                # 一次 describe() 得到所有分类列的统计
+                cat_desc = categorical_df.describe()
                 categorical_summary = {}
                 for col in categorical_df.columns:
-                    desc = df[col].describe()
+                    desc = cat_desc[col]
                     categorical_summary[col] = {
                         "count": int(desc['count']),
                         "unique": int(desc['unique']),
@@ -1710,6 +2339,7 @@ def get_dataframe_summary(
                     }
                 result["categorical_summary"] = categorical_summary
         
+        session.set_cached_meta(cache_key, df, result, ns_version)
         return result
         
     except ValueError as e:
@@ -1759,7 +2389,7 @@ def check_memory_usage(session_id: str) -> Dict[str, Any]:
         manager = get_session_manager()
         session = manager.get_session(session_id)
         
-        memory_info = session.get_memory_info()
+        memory_info = session.get_memory_info(detailed=True)
         
         return {
             "success": True,
@@ -1785,7 +2415,8 @@ def check_memory_usage(session_id: str) -> Dict[str, Any]:
 def get_variable_info(
     variable_name: str,
     session_id: str,
-    include_preview: bool = True
+    include_preview: bool = True,
+    deep: bool = False
 ) -> Dict[str, Any]:
     """
     获取指定变量的详细信息
@@ -1801,6 +2432,7 @@ def get_variable_info(
         variable_name: 会话中变量的名称
         session_id: 会话ID
         include_preview: 是否包含内容预览（默认 True）
+        deep: 是否深度统计 DataFrame/Series 中文本等对象的内存（默认 False，大表上较慢）
     
     Returns:
         Dict: 变量详细信息
@@ -1831,6 +2463,7 @@ def get_variable_info(
     返回格式:
     成功时包含: success, variable_name, type, size_info, content_preview (可选), additional_info (类型相关信息)
     size_info 包含: size_bytes, memory_mb, shape (如适用), element_count (如适用)
+    DataFrame 超过 200 列时 additional_info 只列出前 200 列，并包含 dtypes_truncated, columns_shown, total_columns
     失败时包含: success, error
     """
     try:
@@ -1845,57 +2478,21 @@ def get_variable_info(
                 "error": f"Variable '{variable_name}' not found in session"
             }
         
-        var_type = type(var).__name__
-        size_bytes = sys.getsizeof(var)
+        var_cls = type(var)
+        size_bytes = session.variable_nbytes(var, deep)
         
         result = {
             "success": True,
             "variable_name": variable_name,
-            "type": f"{type(var).__module__}.{var_type}" if hasattr(type(var), '__module__') else var_type,
+            "type": f"{var_cls.__module__}.{var_cls.__name__}",
             "size_info": {
                 "size_bytes": size_bytes,
                 "memory_mb": round(size_bytes / 1024 / 1024, 3)
             }
         }
         
-        # 特殊处理不同类型
-        if hasattr(var, 'shape') and hasattr(var, 'dtypes'):  # DataFrame
-            result["size_info"].update({
-                "shape": list(var.shape),
-                "element_count": var.size
-            })
-            result["additional_info"] = {
-                "columns": list(var.columns),
-                "dtypes": {col: str(dtype) for col, dtype in var.dtypes.items()}
-            }
-            if include_preview:
-                result["content_preview"] = str(var.head())
-                
-        elif hasattr(var, 'shape'):  # numpy array
-            result["size_info"].update({
-                "shape": list(var.shape),
-                "element_count": var.size
-            })
-            result["additional_info"] = {
-                "dtype": str(var.dtype) if hasattr(var, 'dtype') else None
-            }
-            if include_preview:
-                result["content_preview"] = str(var)
-                
-        elif isinstance(var, (list, tuple, dict, set)):
-            result["size_info"]["element_count"] = len(var)
-            if include_preview:
-                preview = str(var)
-                if len(preview) > 200:
-                    preview = preview[:200] + "..."
-                result["content_preview"] = preview
-                
-        else:
-            if include_preview:
-                preview = str(var)
-                if len(preview) > 200:
-                    preview = preview[:200] + "..."
-                result["content_preview"] = preview
+        # 按类型分派到对应的信息处理函数
+        _variable_info_handler(type(var))(var, result, include_preview)
         
         return result
         
@@ -1918,7 +2515,9 @@ def sample_column_data(
     method: str = "mixed",
     sample_size: int = 20,
     max_text_length: int = 100,
-    include_stats: bool = True
+    include_stats: bool = True,
+    stats_sample_rows: Optional[int] = 200_000,
+    include_sample: bool = True
 ) -> Dict[str, Any]:
     """
     智能采样查看 DataFrame 列数据
@@ -1938,6 +2537,9 @@ def sample_column_data(
         sample_size: 采样数量 (默认20)
         max_text_length: 文本最大长度 (默认100字符)
         include_stats: 是否包含统计信息
+        stats_sample_rows: 列行数超过该值时，唯一值/数值/文本统计基于该数量的随机样本估算
+                           (空值计数仍为精确值)，None 表示始终全量统计
+        include_sample: 是否返回采样数据，为 False 时跳过采样，只返回统计信息 (sample_data 为空列表)
     
     Returns:
         Dict: 列数据采样结果
@@ -1974,6 +2576,7 @@ def sample_column_data(
     
     返回格式:
     成功时包含: success, variable_name, column_name, method, sample_data, statistics, total_count
+    statistics 基于样本估算时额外包含 estimated=True 和 sample_rows
     失败时包含: success, error
     """
     try:
@@ -1981,60 +2584,91 @@ def sample_column_data(
         session = manager.get_session(session_id)
         
         # 获取DataFrame对象
-        df = session.shell.user_ns.get(variable_name)
+        df = session.get_dataframe(variable_name)
         if df is None:
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' not found in session"
             }
         
-        if not hasattr(df, 'shape') or not hasattr(df, 'columns'):
+        if not isinstance(df, _DATAFRAME_TYPES):
             return {
                 "success": False,
                 "error": f"Variable '{variable_name}' is not a DataFrame"
             }
         
-        if column_name not in df.columns:
+        # 列存在时只做一次查找，列名列表只在出错时生成
+        try:
+            column_data = df[column_name]
+        except KeyError:
             return {
                 "success": False,
-                "error": f"Column '{column_name}' not found in DataFrame. Available columns: {list(df.columns)}"
+                "error": f"Column '{column_name}' not found in DataFrame. Available columns: {df.columns.tolist()}"
             }
-        
-        column_data = df[column_name]
         total_count = len(column_data)
         
         # 基本统计信息
         stats = {}
         if include_stats:
+            if stats_sample_rows and total_count > stats_sample_rows:
+                # 大列只对随机样本做其余统计，避免为少量预览数据扫描全列；空值数仍按全列精确计数
+                non_null_count = int(column_data.count())
+                positions = np.random.default_rng(0).choice(total_count, size=stats_sample_rows, replace=False)
+                stats_src = column_data.take(positions)
+                src_non_null_count = int(stats_src.count())
+                # nunique 只计数，不生成唯一值数组
+                unique_count = int(stats_src.nunique(dropna=True))
+                sample_info = {"estimated": True, "sample_rows": stats_sample_rows}
+            else:
+                # 一次哈希计数同时得到空值数和唯一值数，无需 count() 与 nunique() 各扫一遍
+                value_counts = column_data.value_counts(dropna=False, sort=False)
+                counts = value_counts.to_numpy()
+                is_null = value_counts.index.isna()
+                non_null_count = total_count - int(counts[is_null].sum())
+                # category 列会列出未出现的类别 (计数为 0)，不计入唯一值
+                unique_count = int(((~is_null) & (counts > 0)).sum())
+                stats_src = column_data
+                src_non_null_count = non_null_count
+                sample_info = {}
+            
             stats = {
                 "total_count": total_count,
-                "null_count": int(column_data.isnull().sum()),
-                "non_null_count": int(column_data.count()),
-                "data_type": str(column_data.dtype)
+                "null_count": total_count - non_null_count,
+                "non_null_count": non_null_count,
+                "data_type": str(column_data.dtype),
+                **sample_info,
+                "unique_count": unique_count,
+                # 抽样时唯一值数来自样本，重复数也只能基于样本的非空数估算
+                "duplicate_count": src_non_null_count - unique_count
             }
             
-            # 唯一值统计
-            unique_values = column_data.dropna().unique()
-            stats["unique_count"] = len(unique_values)
-            stats["duplicate_count"] = total_count - len(unique_values) - stats["null_count"]
-            
-            # 数值类型的特殊统计
-            if column_data.dtype in ['int64', 'float64', 'int32', 'float32']:
-                non_null_data = column_data.dropna()
-                if len(non_null_data) > 0:
+            # 数值类型的特殊统计：按 dtype.kind 判断，覆盖所有位宽及可空整数/浮点类型
+            dtype_kind = column_data.dtype.kind
+            if dtype_kind in 'iuf':
+                if src_non_null_count > 0:
+                    # 一次性转为 float64 数组并去掉空值，之后的各项统计直接用 numpy 归约，
+                    # 不再逐项经过 pandas 的聚合分派 (可空整数类型的 NA 也在此转为 NaN)
+                    values = stats_src.to_numpy(dtype=np.float64, na_value=np.nan)
+                    values = values[~np.isnan(values)]
                     stats["numeric_stats"] = {
-                        "min": float(non_null_data.min()),
-                        "max": float(non_null_data.max()),
-                        "mean": float(non_null_data.mean()),
-                        "median": float(non_null_data.median()),
-                        "std": float(non_null_data.std()) if len(non_null_data) > 1 else 0.0
+                        "min": float(values.min()),
+                        "max": float(values.max()),
+                        "mean": float(values.mean()),
+                        "median": float(np.median(values)),
+                        "std": float(values.std(ddof=1)) if values.size > 1 else 0.0
                     }
             
-            # 文本类型的特殊统计
-            elif column_data.dtype == 'object':
-                non_null_data = column_data.dropna().astype(str)
+            # 文本类型的特殊统计 (object 与 string 类型，不含 category)
+            elif dtype_kind == 'O' and not isinstance(column_data.dtype, pd.CategoricalDtype):
+                non_null_data = stats_src.dropna()
                 if len(non_null_data) > 0:
-                    text_lengths = non_null_data.str.len()
+                    if isinstance(non_null_data.dtype, pd.StringDtype):
+                        # string 类型的 .str.len() 由底层数组实现，直接使用
+                        text_lengths = non_null_data.str.len().to_numpy(dtype=np.int64)
+                    else:
+                        # object 列一次遍历计算长度，避免 astype(str) 复制整列和 .str 访问器的逐元素分派
+                        values = non_null_data.to_numpy()
+                        text_lengths = np.fromiter((len(str(v)) for v in values), dtype=np.int64, count=values.size)
                     stats["text_stats"] = {
                         "min_length": int(text_lengths.min()),
                         "max_length": int(text_lengths.max()),
@@ -2042,28 +2676,25 @@ def sample_column_data(
                     }
         
         # 数据采样
-        sample_data = []
         actual_sample_size = min(sample_size, total_count)
         
-        if method == "head":
+        if not include_sample:
+            # 只需要统计信息时不做任何采样
+            sampled = column_data.iloc[:0]
+        elif method == "head":
             sampled = column_data.head(actual_sample_size)
         elif method == "tail":
             sampled = column_data.tail(actual_sample_size)
         elif method == "random":
-            sampled = column_data.sample(n=actual_sample_size) if total_count > 0 else column_data.head(0)
+            sampled = column_data.sample(n=actual_sample_size, random_state=_RNG) if total_count > 0 else column_data.head(0)
         elif method == "unique":
-            # 获取唯一值
-            unique_values = column_data.dropna().unique()
-            if len(unique_values) > actual_sample_size:
+            # 去重后保留为 Series，index 为各值首次出现的行号，无需再从数组重建
+            unique_data = column_data.dropna().drop_duplicates()
+            if len(unique_data) > actual_sample_size:
                 # 如果唯一值太多，随机选择
-                import numpy as np
-                selected_indices = np.random.choice(len(unique_values), actual_sample_size, replace=False)
-                sampled_values = unique_values[selected_indices]
+                sampled = unique_data.sample(n=actual_sample_size, random_state=_RNG)
             else:
-                sampled_values = unique_values
-            
-            # 创建一个Series用于统一处理
-            sampled = pd.Series(sampled_values)
+                sampled = unique_data
         elif method == "mixed":
             # 混合采样：头部、尾部、随机各占一部分
             third = actual_sample_size // 3
@@ -2073,45 +2704,39 @@ def sample_column_data(
             tail_size = third + (1 if remainder > 1 else 0)
             random_size = third
             
-            samples = []
-            if head_size > 0:
-                samples.extend(column_data.head(head_size).tolist())
-            if tail_size > 0:
-                samples.extend(column_data.tail(tail_size).tolist())
+            # 先拼出头部、尾部和中间随机部分的行位置，再一次 take 取出，
+            # 数据始终留在 pandas/numpy 中，不经过 Python 列表
+            position_parts = [np.arange(head_size), np.arange(total_count - tail_size, total_count)]
             if random_size > 0 and total_count > head_size + tail_size:
-                # 避免重复采样已经在头部和尾部的数据
-                middle_data = column_data.iloc[head_size:-tail_size] if tail_size > 0 else column_data.iloc[head_size:]
-                if len(middle_data) > 0:
-                    random_samples = middle_data.sample(n=min(random_size, len(middle_data)))
-                    samples.extend(random_samples.tolist())
+                # 只在头尾之间的位置区间内抽取位置，避免复制中间段数据
+                middle_count = total_count - head_size - tail_size
+                position_parts.append(head_size + _RNG.choice(
+                    middle_count, size=min(random_size, middle_count), replace=False
+                ))
             
-            sampled = pd.Series(samples)
+            sampled = column_data.take(np.concatenate(position_parts))
         else:
             return {
                 "success": False,
                 "error": f"Invalid method '{method}'. Use 'head', 'tail', 'random', 'unique', or 'mixed'"
             }
         
-        # 处理采样数据，截断过长的文本
-        for idx, value in sampled.items():
-            processed_value = value
-            
-            # 处理空值
-            if pd.isna(value):
-                processed_value = None
-            else:
-                # 转换为字符串并截断
-                str_value = str(value)
-                if len(str_value) > max_text_length:
-                    processed_value = str_value[:max_text_length] + "..."
-                else:
-                    processed_value = str_value
-            
-            sample_data.append({
+        # 处理采样数据：整列一次性转为字符串并截断，空值置为 None
+        # 先装箱为 Python 对象再逐个 str()，与原值的 str() 文本一致
+        # (astype(str) 对日期、时间差、float32 的格式不同)
+        null_mask = sampled.isna().to_numpy()
+        text_data = sampled.astype(object).map(str)
+        too_long = (text_data.str.len() > max_text_length).to_numpy()
+        text_values = text_data.str.slice(0, max_text_length).to_numpy(dtype=object)
+        sample_data = [
+            {
                 "index": int(idx) if pd.notna(idx) and hasattr(idx, '__int__') else str(idx),
-                "value": processed_value,
+                "value": None if is_null else (text + "..." if is_long else text),
                 "original_type": type(value).__name__
-            })
+            }
+            for idx, value, text, is_null, is_long
+            in zip(sampled.index, sampled, text_values, null_mask, too_long)
+        ]
         
         result = {
             "success": True,
@@ -2177,54 +2802,43 @@ def clear_variables(
         manager = get_session_manager()
         session = manager.get_session(session_id)
         
-        initial_memory = session._get_memory_usage()
         cleared_variables = []
         
         if clear_all:
-            # 清理所有用户变量
+            # 清理所有用户变量；保留导入时按 isinstance 跳过模块对象
             user_ns = session.shell.user_ns
-            to_delete = []
-            
-            for name in user_ns:
-                if not name.startswith('_') and name not in ['In', 'Out', 'get_ipython', 'exit', 'quit']:
-                    # 如果保留导入，跳过模块类型的变量
-                    if keep_imports and hasattr(user_ns[name], '__module__'):
-                        var_type = type(user_ns[name]).__name__
-                        if 'module' in var_type.lower():
-                            continue
-                    to_delete.append(name)
-            
-            for name in to_delete:
-                if name in user_ns:
-                    del user_ns[name]
-                    cleared_variables.append(name)
+            to_delete = [
+                name for name, value in user_ns.items()
+                if session.is_user_variable(name)
+                and not (keep_imports and isinstance(value, types.ModuleType))
+            ]
                     
         elif variable_names:
             # 清理指定变量
             user_ns = session.shell.user_ns
-            for name in variable_names:
-                if name in user_ns:
-                    del user_ns[name]
-                    cleared_variables.append(name)
+            # dict.fromkeys 去重并保持顺序，重复传入的变量名只删除一次
+            to_delete = [name for name in dict.fromkeys(variable_names) if name in user_ns]
         else:
             return {
                 "success": False,
                 "error": "Must specify either variable_names or set clear_all=True"
             }
         
-        # 强制垃圾回收
-        import gc
-        gc.collect()
+        freed_bytes = sum(session.variable_nbytes(user_ns[name]) for name in to_delete)
+        session.delete_variables(to_delete)
+        cleared_variables.extend(to_delete)
         
-        final_memory = session._get_memory_usage()
-        memory_freed = initial_memory - final_memory
+        # 只有释放了较多数据时才做完整垃圾回收，其耗时与存活对象总数成正比
+        if freed_bytes > _GC_MIN_FREED_BYTES:
+            gc.collect()
         
         variables_after = session.get_variables()
         
         return {
             "success": True,
             "cleared_variables": cleared_variables,
-            "memory_freed_mb": round(memory_freed, 2),
+            # 按被删除对象的数据量计算，不受进程内其他分配的干扰
+            "memory_freed_mb": round(freed_bytes * _MB, 2),
             "remaining_variables": len(variables_after)
         }
         